@@ -1,18 +1,35 @@
 #!/usr/bin/env python3
 import argparse
+import atexit
 import subprocess
 import json
 import sys
 import os
 import threading
 import time
+import random
 import socket
+import queue
+import signal
+import http.client
+import urllib.parse
 import urllib.request
 import urllib.error
+import re
 import tempfile
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
 
+# Prefer the libyaml bindings, they are much faster than the pure Python implementation
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# Matches a top-level testoverride key in the FTW config file
+TESTOVERRIDE_KEY_RE = re.compile(r'^testoverride\s*:', re.MULTILINE)
+
 
 class KubeHelper:
     """Helper class to manage kubectl operations with consistent namespace and kubeconfig."""
@@ -20,26 +37,98 @@ class KubeHelper:
     def __init__(self, namespace, kubeconfig):
         self.namespace = namespace
         self.kubeconfig = kubeconfig
-
-    def kubectl(self, *args, capture_output=True, text=True, check=True):
+        self.proxy_process = None
+        # Set when the proxy is being stopped, so that the streams reading through it end quietly
+        self._stopping = threading.Event()
+        self.proxy_port = self._start_proxy()
+        # Keep-alive connections to the proxy, one per thread (HTTPConnection is not thread-safe)
+        self._local = threading.local()
+
+    def _start_proxy(self, timeout=10.0):
         """
-        Execute kubectl command with the configured namespace and kubeconfig.
+        Start a kubectl proxy so API requests reuse a single authenticated connection
+        to the API server instead of spawning a kubectl process per call.
 
-            *args: kubectl command arguments.
-            capture_output (bool): Whether to capture stdout/stderr (passed to subprocess.run).
-            text (bool): Whether to decode output as text (passed to subprocess.run).
-            check (bool): Whether to raise CalledProcessError on non-zero exit (passed to subprocess.run).
         Returns:
-            subprocess.CompletedProcess: Result of the kubectl command.
+            int: Local port the proxy is serving on.
+        """
+        self.proxy_process = subprocess.Popen(
+            [
+                "kubectl",
+                "--kubeconfig", self.kubeconfig,
+                "proxy",
+                "--port=0"
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=1,
+            text=True,
+            start_new_session=True
+        )
+        atexit.register(self._stop_proxy)
 
+        # kubectl prints "Starting to serve on 127.0.0.1:PORT" once it is listening
+        line = wait_for_output(self.proxy_process, "Starting to serve on", timeout)
+        if not line:
+            print("Error: kubectl proxy did not start", file=sys.stderr)
+            sys.exit(1)
+        return int(line.strip().rsplit(":", 1)[1])
+
+    def _stop_proxy(self):
+        """Stop the kubectl proxy if it is running."""
+        self._stopping.set()
+        if self.proxy_process:
+            stop_process_group(self.proxy_process)
+
+    def _connection(self):
+        """Return this thread's keep-alive connection to the kubectl proxy, creating it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection("127.0.0.1", self.proxy_port, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def api_get(self, path, **params):
         """
-        cmd = [
-            "kubectl",
-            "--kubeconfig", self.kubeconfig,
-            "-n", self.namespace
-        ] + list(args)
+        Perform a GET request against the Kubernetes API through the kubectl proxy.
+
+        The connection to the proxy is kept alive and reused across calls from the
+        same thread.
+
+        Args:
+            path: API path (e.g., "/api/v1/namespaces/default/services")
+            **params: Query parameters
+
+        Returns:
+            dict: Decoded JSON response.
 
-        return subprocess.run(cmd, capture_output=capture_output, text=text, check=check)
+        Raises:
+            http.client.HTTPException: If the API server returns a non-200 status.
+        """
+        if params:
+            path += "?" + urllib.parse.urlencode(params)
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError):
+                # The proxy closed an idle keep-alive connection, reconnect once
+                conn.close()
+                if attempt:
+                    raise
+            except BaseException:
+                # Never leave the connection in the middle of a request (e.g. after a
+                # timeout), the next call on this thread would fail with CannotSendRequest
+                conn.close()
+                raise
+        if response.status != 200:
+            raise http.client.HTTPException(
+                f"{response.status} {response.reason}: {body.decode(errors='replace')}"
+            )
+        return json.loads(body)
 
     def get_gateway_service_info(self, gateway_name):
         """
@@ -52,17 +141,18 @@ class KubeHelper:
                    - service_name is the name of the service
         """
         try:
-            result = self.kubectl(
-                "get", "services",
-                "-l", f"gateway.networking.k8s.io/gateway-name={gateway_name}",
-                "-o", "json"
+            data = self.api_get(
+                f"/api/v1/namespaces/{self.namespace}/services",
+                labelSelector=f"gateway.networking.k8s.io/gateway-name={gateway_name}"
             )
-            data = json.loads(result.stdout)
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing kubectl: {e.stderr}", file=sys.stderr)
+        except http.client.HTTPException as e:
+            print(f"Error listing services: {e}", file=sys.stderr)
+            sys.exit(1)
+        except OSError as e:
+            print(f"Error connecting to kubectl proxy: {e}", file=sys.stderr)
             sys.exit(1)
         except json.JSONDecodeError as e:
-            print(f"Error parsing kubectl output: {e}", file=sys.stderr)
+            print(f"Error parsing API server response: {e}", file=sys.stderr)
             sys.exit(1)
 
         # Check that we have exactly one service
@@ -98,47 +188,145 @@ class KubeHelper:
 
         return ip_or_type, port, service_name
 
-    def port_forward(self, service_name, local_port, service_port):
+    def stream_pod_logs(self, label_selector, output_file, ready_event=None):
         """
-        Create a port-forward to a service (blocking call, should be run in a thread).
+        Stream logs from pods matching a label selector to a file (blocking call, should be run in a thread).
+
+        Logs are read from the API server through the kubectl proxy, with one follow
+        stream per container. Pods are watched so that containers which start later
+        are picked up as well.
 
         Args:
-            service_name: Name of the service
-            local_port: Local port to forward to
-            service_port: Service port to forward from
+            label_selector: Label selector to find the pods (e.g., "gateway.networking.k8s.io/gateway-name=mygateway")
+            output_file: File path to write logs to
+            ready_event: Optional threading.Event set once the first log line is written
         """
-        self.kubectl(
-            "port-forward",
-            f"service/{service_name}",
-            f"{local_port}:{service_port}",
-            capture_output=False,
-            check=False
-        )
+        pods_path = f"/api/v1/namespaces/{self.namespace}/pods"
+        lock = threading.Lock()
+        streaming = set()
 
-    def stream_pod_logs(self, label_selector, output_file):
+        with open(output_file, 'w', buffering=1) as f:
+            def write(text):
+                with lock:
+                    f.write(text)
+                if ready_event is not None and not ready_event.is_set():
+                    ready_event.set()
+
+            def start_streams(pod):
+                pod_name = pod.get("metadata", {}).get("name", "")
+                status = pod.get("status", {})
+                container_statuses = status.get("initContainerStatuses", []) + status.get("containerStatuses", [])
+                for container_status in container_statuses:
+                    # Logs are only available once the container has started
+                    state = container_status.get("state", {})
+                    if "running" not in state and "terminated" not in state:
+                        continue
+                    key = (pod_name, container_status.get("name", ""))
+                    if key in streaming:
+                        continue
+                    streaming.add(key)
+                    threading.Thread(
+                        target=self._follow_container_logs,
+                        args=(key[0], key[1], write),
+                        daemon=True
+                    ).start()
+
+            while not self._stopping.is_set():
+                try:
+                    pod_list = self.api_get(pods_path, labelSelector=label_selector)
+                    for pod in pod_list.get("items", []):
+                        start_streams(pod)
+
+                    # Watch for pods and containers that start after the initial listing
+                    conn = http.client.HTTPConnection("127.0.0.1", self.proxy_port)
+                    query = urllib.parse.urlencode({
+                        "watch": "true",
+                        "labelSelector": label_selector,
+                        "resourceVersion": pod_list.get("metadata", {}).get("resourceVersion", ""),
+                    })
+                    try:
+                        conn.request("GET", f"{pods_path}?{query}")
+                        response = conn.getresponse()
+                        if response.status != 200:
+                            raise http.client.HTTPException(f"watch returned {response.status} {response.reason}")
+                        for line in response:
+                            event = json.loads(line)
+                            if event.get("type") in ("ADDED", "MODIFIED"):
+                                start_streams(event.get("object", {}))
+                    finally:
+                        conn.close()
+                except (http.client.HTTPException, OSError, json.JSONDecodeError) as e:
+                    if self._stopping.is_set():
+                        return
+                    print(f"Error watching pods: {e}", file=sys.stderr)
+                    self._stopping.wait(1)
+
+    def _follow_container_logs(self, pod_name, container, write):
         """
-        Stream logs from pods matching a label selector to a file (blocking call, should be run in a thread).
+        Follow the logs of a single container and write them to an open file.
 
         Args:
-            label_selector: Label selector to find the pods (e.g., "gateway.networking.k8s.io/gateway-name=mygateway")
-            output_file: File path to write logs to
+            pod_name: Name of the pod
+            container: Name of the container
+            write: Thread-safe callable writing a chunk of log output to the log file
         """
-        with open(output_file, 'w', buffering=1) as f:
-            process = subprocess.Popen(
-                [
-                    "kubectl",
-                    "--kubeconfig", self.kubeconfig,
-                    "-n", self.namespace,
-                    "logs",
-                    "-l", label_selector,
-                    "-f",
-                    "--all-containers=true"
-                ],
-                stdout=f,
-                stderr=subprocess.STDOUT,
-                text=True
-            )
-            process.wait()
+        conn = http.client.HTTPConnection("127.0.0.1", self.proxy_port)
+        # Only the recent history, like kubectl logs with a label selector
+        query = urllib.parse.urlencode({"follow": "true", "container": container, "tailLines": 10})
+        try:
+            conn.request("GET", f"/api/v1/namespaces/{self.namespace}/pods/{pod_name}/log?{query}")
+            response = conn.getresponse()
+            if response.status != 200:
+                print(f"Error streaming logs for {pod_name}/{container}: {response.status} {response.reason}", file=sys.stderr)
+                return
+            for line in response:
+                write(line.decode("utf-8", errors="replace"))
+        except (http.client.HTTPException, OSError) as e:
+            if not self._stopping.is_set():
+                print(f"Error streaming logs for {pod_name}/{container}: {e}", file=sys.stderr)
+        finally:
+            conn.close()
+
+
+def stop_process_group(process, timeout=0.5):
+    """
+    Stop a process started with start_new_session=True together with any children.
+
+    The process group is sent SIGTERM first and SIGKILL if the process is still
+    running after the timeout.
+
+    Args:
+        process: subprocess.Popen object, leader of its own process group
+        timeout: Time in seconds to wait for a graceful exit
+
+    Returns:
+        bool: True if the process exited on SIGTERM (or had already exited), False if it had to be killed
+    """
+    if process.poll() is not None:
+        return True
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+        return False
+    except ProcessLookupError:
+        # The group went away in between
+        process.wait()
+        return True
+
+
+def exit_on_signal(signum, frame):
+    """
+    Exit through SystemExit on a termination signal.
+
+    kubectl proxy and port-forward run in their own sessions, so signals sent to
+    the process group of this script do not reach them. Exiting this way runs the
+    finally blocks and atexit handlers that stop them.
+    """
+    sys.exit(128 + signum)
 
 
 def find_free_port():
@@ -149,43 +337,234 @@ def find_free_port():
         return s.getsockname()[1]
 
 
-def test_connectivity(host, port, max_retries=30, retry_delay=1):
+def wait_for_output(process, marker, timeout=10.0):
+    """
+    Wait until a long-running kubectl process prints a line containing marker.
+
+    kubectl port-forward and proxy report readiness on stdout ("Forwarding from ...",
+    "Starting to serve on ...") as soon as their listener is bound, so the output is
+    read instead of polling the port. A background thread reads the output line by
+    line and keeps draining it once the marker was seen, so the pipe never fills up.
+
+    Args:
+        process: kubectl process started with a text mode stdout pipe
+        marker: Text identifying the readiness line
+        timeout: Maximum time to wait in seconds
+
+    Returns:
+        str: The readiness line, or None on timeout or if kubectl exited
+    """
+    lines = queue.Queue()
+
+    def read():
+        found = False
+        for line in process.stdout:
+            if not found:
+                found = marker in line
+                lines.put(line)
+        if not found:
+            # kubectl exited before it was ready
+            lines.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        try:
+            line = lines.get(timeout=remaining)
+        except queue.Empty:
+            return None
+        if line is None:
+            return None
+        if marker in line:
+            return line
+        print(f"kubectl: {line.rstrip()}", file=sys.stderr)
+
+
+def test_connectivity(host, port, timeout=30.0, base_delay=0.05, max_delay=2.0, jitter=0.5):
     """
     Test connectivity to a host:port combination.
 
+    Failed attempts are retried with capped exponential backoff and jitter until
+    the timeout is reached. Any HTTP response, including error statuses such as
+    404 or 403, means the gateway is serving and counts as success.
+
     Args:
         host: Host to connect to
         port: Port to connect to
-        max_retries: Maximum number of connection attempts
-        retry_delay: Delay between retries in seconds
+        timeout: Total time to keep retrying in seconds
+        base_delay: Delay after the first failed attempt in seconds
+        max_delay: Upper bound for the delay between attempts in seconds
+        jitter: Maximum random fraction added to each delay
 
     Returns:
         bool: True if connection successful, False otherwise
     """
     url = f"http://{host}:{port}"
+    deadline = time.monotonic() + timeout
+    attempt = 0
 
-    for attempt in range(max_retries):
+    while True:
         try:
-            # Try to make a simple HTTP request
-            with urllib.request.urlopen(url, timeout=2) as response:
+            # Try to make a simple HTTP request, the response body is not needed
+            request = urllib.request.Request(url, method="HEAD")
+            with urllib.request.urlopen(request, timeout=2) as response:
                 status_code = response.getcode()
                 print(f"Connectivity test successful: {url} (status: {status_code})")
                 return True
-        except (urllib.error.URLError, OSError) as e:
-            if attempt < max_retries - 1:
-                print(f"Connection attempt {attempt + 1}/{max_retries} failed, retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-            else:
-                print(f"Connection failed after {max_retries} attempts")
-                return False
+        except urllib.error.HTTPError as e:
+            print(f"Connectivity test successful: {url} (status: {e.code})")
+            return True
+        except (urllib.error.URLError, OSError):
+            pass
         except Exception as e:
             print(f"Unexpected error during connectivity test: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-            else:
-                return False
 
-    return False
+        attempt += 1
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"Connection failed after {attempt} attempts")
+            return False
+
+        delay = min(max_delay, base_delay * 2 ** (attempt - 1) * (1 + random.uniform(0, jitter)), remaining)
+        print(f"Connection attempt {attempt} failed, retrying in {delay:.2f}s...")
+        time.sleep(delay)
+
+
+def wait_for_gateway(port_forward_process, target_host, target_port):
+    """
+    Wait for the port-forward (if any) to be ready and test connectivity to the gateway.
+
+    Args:
+        port_forward_process: kubectl port-forward process, or None when not port-forwarding
+        target_host: Host to test
+        target_port: Port to test
+
+    Returns:
+        bool: True if the gateway is reachable, False otherwise
+    """
+    if port_forward_process and not wait_for_output(port_forward_process, "Forwarding from"):
+        print(f"ERROR: Port-forward did not start listening on {target_host}:{target_port}", file=sys.stderr)
+        return False
+
+    print(f"\nTesting connectivity to {target_host}:{target_port}...")
+    return test_connectivity(target_host, target_port)
+
+
+def start_log_streaming(kube, gateway):
+    """
+    Start streaming the gateway pod logs to a temporary file and wait for the first output.
+
+    Args:
+        kube: KubeHelper for the gateway namespace
+        gateway: Gateway name
+
+    Returns:
+        str: Path of the log file
+    """
+    log_file = tempfile.NamedTemporaryFile(mode='w', prefix='ftw_logs_', suffix='.log', delete=False)
+    log_filename = log_file.name
+    log_file.close()  # Close it so the log stream can write to it
+
+    print(f"Streaming pod logs to: {log_filename}")
+
+    log_ready = threading.Event()
+    log_thread = threading.Thread(
+        target=kube.stream_pod_logs,
+        args=(f"gateway.networking.k8s.io/gateway-name={gateway}", log_filename, log_ready),
+        daemon=True
+    )
+    log_thread.start()
+
+    # Wait for the first log line to be written, with a configurable timeout
+    log_start_timeout = float(os.getenv("FTW_LOG_START_TIMEOUT_SECONDS", "5"))
+    if not log_ready.wait(timeout=log_start_timeout):
+        print(
+            f"Warning: log file {log_filename} not initialized after {log_start_timeout} seconds; "
+            "continuing without confirmed log streaming.",
+            file=sys.stderr,
+        )
+
+    return log_filename
+
+
+def write_config(config_file, target_host, target_port):
+    """
+    Load the FTW config file, add the runtime overrides and write it to a temporary file.
+
+    Args:
+        config_file: FTW configuration file
+        target_host: Host the tests are sent to
+        target_port: Port the tests are sent to
+
+    Returns:
+        str: Path of the modified config file
+    """
+    # Load the config file to add runtime overrides
+    try:
+        with open(config_file, 'r') as f:
+            content = f.read()
+        if TESTOVERRIDE_KEY_RE.search(content):
+            config = yaml.load(content, Loader=SafeLoader) or {}
+        else:
+            config = None
+    except FileNotFoundError:
+        print(f"ERROR: Config file not found: {config_file}", file=sys.stderr)
+        sys.exit(1)
+    except PermissionError:
+        print(f"ERROR: Permission denied reading config file: {config_file}", file=sys.stderr)
+        sys.exit(1)
+    except yaml.YAMLError as e:
+        print(f"ERROR: Invalid YAML in config file {config_file}: {e}", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"ERROR: Failed to load config file {config_file}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if config is None:
+        # Without an existing testoverride key the overrides can simply be appended,
+        # there is no need for a full YAML round-trip
+        if content and not content.endswith("\n"):
+            content += "\n"
+        content += (
+            "testoverride:\n"
+            "  input:\n"
+            f"    dest_addr: {json.dumps(target_host)}\n"
+            f"    port: {target_port}\n"
+        )
+    else:
+        # Add input settings under testoverride
+        if 'testoverride' not in config:
+            config['testoverride'] = {}
+        if 'input' not in config['testoverride']:
+            config['testoverride']['input'] = {}
+
+        config['testoverride']['input']['dest_addr'] = target_host
+        config['testoverride']['input']['port'] = target_port
+
+    # Write modified config to a temporary file
+    try:
+        modified_config_file = tempfile.NamedTemporaryFile(mode='w', prefix='ftw_config_', suffix='.yaml', delete=False)
+        if config is None:
+            modified_config_file.write(content)
+        else:
+            yaml.dump(config, modified_config_file, Dumper=SafeDumper, default_flow_style=False)
+        modified_config_filename = modified_config_file.name
+        modified_config_file.close()
+    except PermissionError as e:
+        print(f"ERROR: Permission denied creating temporary config file: {e}", file=sys.stderr)
+        sys.exit(1)
+    except yaml.YAMLError as e:
+        print(f"ERROR: Failed to serialize config to YAML: {e}", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"ERROR: Failed to create modified config file: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    return modified_config_filename
 
 
 def main():
@@ -200,6 +579,10 @@ def main():
 
     args = parser.parse_args()
 
+    # Stop the kubectl helpers when the run is cancelled (CI job cancellation, timeout)
+    for signum in (signal.SIGTERM, signal.SIGHUP):
+        signal.signal(signum, exit_on_signal)
+
     # Initialize Kubernetes helper
     kube = KubeHelper(args.namespace, args.kubeconfig)
 
@@ -233,101 +616,34 @@ def main():
                     f"{local_port}:{port}"
                 ],
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+                stderr=subprocess.STDOUT,
+                bufsize=1,
+                text=True,
+                start_new_session=True
             )
 
             # Update target for connectivity test
             target_host = "127.0.0.1"
             target_port = local_port
 
-            # Give port-forward a moment to start
-            time.sleep(2)
+        # Wait for the gateway, start log streaming and write the config in parallel,
+        # these steps are independent of each other and each has its own timeout
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            gateway_ready = executor.submit(wait_for_gateway, port_forward_process, target_host, target_port)
+            log_stream = executor.submit(start_log_streaming, kube, args.gateway)
+            config = executor.submit(write_config, args.config_file, target_host, target_port)
 
-        # Test connectivity
-        print(f"\nTesting connectivity to {target_host}:{target_port}...")
-        if not test_connectivity(target_host, target_port):
-            print("ERROR: Could not establish connectivity to the gateway", file=sys.stderr)
-            sys.exit(1)
+            if not gateway_ready.result():
+                print("ERROR: Could not establish connectivity to the gateway", file=sys.stderr)
+                sys.exit(1)
+            log_filename = log_stream.result()
+            modified_config_filename = config.result()
 
         print("\n" + "="*60)
         print("Gateway is ready for testing")
         print(f"Target: {target_host}:{target_port}")
         print("="*60 + "\n")
 
-        # Set up log streaming
-        log_file = tempfile.NamedTemporaryFile(mode='w', prefix='ftw_logs_', suffix='.log', delete=False)
-        log_filename = log_file.name
-        log_file.close()  # Close it so kubectl can write to it
-
-        print(f"Streaming pod logs to: {log_filename}")
-
-        log_thread = threading.Thread(
-            target=kube.stream_pod_logs,
-            args=(f"gateway.networking.k8s.io/gateway-name={args.gateway}", log_filename),
-            daemon=True
-        )
-        log_thread.start()
-
-        # Wait for log streaming to start with a readiness check and configurable timeout
-        log_start_timeout = float(os.getenv("FTW_LOG_START_TIMEOUT_SECONDS", "5"))
-        log_start_deadline = time.time() + log_start_timeout
-        while time.time() < log_start_deadline:
-            try:
-                if os.path.exists(log_filename) and os.path.getsize(log_filename) > 0:
-                    break
-            except OSError:
-                # File may not be ready yet; ignore and retry
-                pass
-            time.sleep(0.1)
-        if not os.path.exists(log_filename) or os.path.getsize(log_filename) == 0:
-            print(
-                f"Warning: log file {log_filename} not initialized after {log_start_timeout} seconds; "
-                "continuing without confirmed log streaming.",
-                file=sys.stderr,
-            )
-
-        # Load and modify the config file to add runtime overrides
-        try:
-            with open(args.config_file, 'r') as f:
-                config = yaml.safe_load(f) or {}
-        except FileNotFoundError:
-            print(f"ERROR: Config file not found: {args.config_file}", file=sys.stderr)
-            sys.exit(1)
-        except PermissionError:
-            print(f"ERROR: Permission denied reading config file: {args.config_file}", file=sys.stderr)
-            sys.exit(1)
-        except yaml.YAMLError as e:
-            print(f"ERROR: Invalid YAML in config file {args.config_file}: {e}", file=sys.stderr)
-            sys.exit(1)
-        except Exception as e:
-            print(f"ERROR: Failed to load config file {args.config_file}: {e}", file=sys.stderr)
-            sys.exit(1)
-
-        # Add input settings under testoverride
-        if 'testoverride' not in config:
-            config['testoverride'] = {}
-        if 'input' not in config['testoverride']:
-            config['testoverride']['input'] = {}
-
-        config['testoverride']['input']['dest_addr'] = target_host
-        config['testoverride']['input']['port'] = target_port
-
-        # Write modified config to a temporary file
-        try:
-            modified_config_file = tempfile.NamedTemporaryFile(mode='w', prefix='ftw_config_', suffix='.yaml', delete=False)
-            yaml.dump(config, modified_config_file)
-            modified_config_filename = modified_config_file.name
-            modified_config_file.close()
-        except PermissionError as e:
-            print(f"ERROR: Permission denied creating temporary config file: {e}", file=sys.stderr)
-            sys.exit(1)
-        except yaml.YAMLError as e:
-            print(f"ERROR: Failed to serialize config to YAML: {e}", file=sys.stderr)
-            sys.exit(1)
-        except Exception as e:
-            print(f"ERROR: Failed to create modified config file: {e}", file=sys.stderr)
-            sys.exit(1)
-
         # Run FTW tests
         print("\n" + "="*60)
         print("Running FTW tests...")
@@ -378,13 +694,8 @@ def main():
         # Cleanup: stop port-forward if it was started
         if port_forward_process:
             print("\nStopping port-forward...")
-            port_forward_process.terminate()
-            try:
-                port_forward_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                print("Port-forward did not stop gracefully, killing...")
-                port_forward_process.kill()
-                port_forward_process.wait()
+            if not stop_process_group(port_forward_process):
+                print("Port-forward did not stop gracefully, killed")
 
 
 if __name__ == "__main__":
@@ -12,10 +12,12 @@ the --include-test-rule flag.
 """
 
 import argparse
+import os
 import sys
 import re
-from pathlib import Path
-from typing import List, Tuple, Set
+import string
+from collections import defaultdict
+from typing import FrozenSet, Iterator, List, Tuple, Set
 
 
 # Base rules configmap content (from config/samples/ruleset.yaml)
@@ -140,125 +142,182 @@ X_CRS_TEST_RULE = """    SecResponseBodyMimeType text/plain text/html text/xml a
      ctl:ruleRemoveById=1-999999"
 """
 
+# Matches a whole SecRule, SecAction or SecMarker directive, including any lines
+# joined to it with a trailing backslash continuation
+RULE_RE = re.compile(rb'^[ \t]*(SecRule|SecAction|SecMarker)\b(?:[^\n]*\\[^\S\n]*\n)*[^\n]*', re.MULTILINE)
 
-def get_rule_files(rules_dir: str) -> List[Path]:
-    """Get all .conf files from the rules directory."""
-    rules_path = Path(rules_dir)
+# Cheaper variant of RULE_RE for files without any line continuation, where every
+# directive is a single line
+SINGLE_LINE_RULE_RE = re.compile(rb'^[ \t]*(SecRule|SecAction|SecMarker)\b[^\n]*', re.MULTILINE)
 
-    if not rules_path.exists():
-        print(f"ERROR: Rules directory not found: {rules_path}", file=sys.stderr)
-        sys.exit(1)
+# Matches a backslash line continuation
+CONTINUATION_RE = re.compile(rb'\\[^\S\n]*\n')
 
-    if not rules_path.is_dir():
-        print(f"ERROR: Path is not a directory: {rules_path}", file=sys.stderr)
-        sys.exit(1)
+# Matches decoded lines holding only whitespace
+UNICODE_BLANK_LINE_RE = re.compile(r'^[^\S\n]+$', re.MULTILINE)
 
-    conf_files = sorted(rules_path.glob("*.conf"))
-    print(f"Found {len(conf_files)} .conf files in {rules_path}", file=sys.stderr)
-    return conf_files
+# Matches the id action of a directive
+ID_RE = re.compile(rb'id:(\d+)')
 
+# Operator that Coraza does not support, see --ignore-pmFromFile
+PMFROMFILE = b'@pmFromFile'
 
-def extract_rule_id(rule_text: str) -> str:
-    """Extract the ID from a SecRule."""
-    # Look for id:NUMBER pattern
-    match = re.search(r'id:(\d+)', rule_text)
-    if match:
-        return match.group(1)
-    return "unknown"
+# str.translate table for ConfigMap names: lowercase alphanumerics, '-' and '.' are
+# kept, uppercase letters are lowercased, '_' becomes '-' and anything else is dropped
+CONFIGMAP_NAME_TABLE = defaultdict(lambda: None, {
+    **{ord(c): c for c in string.ascii_lowercase + string.digits + '-.'},
+    **{ord(c): c.lower() for c in string.ascii_uppercase},
+    ord('_'): '-',
+})
 
 
-def split_into_rules(content: str) -> List[str]:
-    """
-    Split file content into individual rules/directives.
+def get_rule_files(rules_dir: str) -> List[str]:
+    """Get the paths of all .conf files from the rules directory."""
+    rules_path = os.path.normpath(rules_dir)
 
-    Returns a list of text blocks, where each block is either:
-    - A SecRule, SecAction, or other Sec* directive (potentially multi-line with backslash continuations)
-    - Comments or blank lines
-    """
-    lines = content.split('\n')
-    blocks = []
-    current_block = []
-    in_multiline = False
-
-    for line in lines:
-        stripped = line.rstrip()
-
-        # Check if this is a continuation of a multi-line rule
-        if in_multiline:
-            current_block.append(line)
-            if not stripped.endswith('\\'):
-                in_multiline = False
-                blocks.append('\n'.join(current_block))
-                current_block = []
-        # Check if this starts a Sec* directive (SecRule, SecAction, SecMarker, etc.)
-        elif not stripped.startswith('#') and re.match(r'^(SecRule|SecAction|SecMarker)\b', stripped):
-            current_block = [line]
-            if stripped.endswith('\\'):
-                in_multiline = True
-            else:
-                blocks.append('\n'.join(current_block))
-                current_block = []
-        # Other directives, comments, or blank lines
-        else:
-            blocks.append(line)
+    if not os.path.exists(rules_path):
+        print(f"ERROR: Rules directory not found: {rules_path}", file=sys.stderr)
+        sys.exit(1)
 
-    # Add any remaining block
-    if current_block:
-        blocks.append('\n'.join(current_block))
+    if not os.path.isdir(rules_path):
+        print(f"ERROR: Path is not a directory: {rules_path}", file=sys.stderr)
+        sys.exit(1)
 
-    return blocks
+    # All paths share the directory prefix, so sorting the path strings orders the files by name
+    with os.scandir(rules_path) as it:
+        conf_files = sorted(entry.path for entry in it if entry.name.endswith('.conf') and entry.is_file())
+    print(f"Found {len(conf_files)} .conf files in {rules_path}", file=sys.stderr)
+    return conf_files
 
 
-def process_file_content(file_path: Path, ignore_rule_ids: Set[str], ignore_pmfromfile: bool) -> Tuple[str, List[Tuple[str, str]]]:
+def process_file_content(file_path: str, ignore_rule_ids: FrozenSet[bytes], ignore_pmfromfile: bool) -> Tuple[bytes, List[Tuple[str, str]]]:
     """
     Process a rule file and remove rules with @pmFromFile or rules with IDs in the ignore list.
 
+    The remaining content is returned already indented for the ConfigMap YAML, as UTF-8.
+
     Args:
         file_path: Path to the rule file
-        ignore_rule_ids: Set of rule IDs to ignore
+        ignore_rule_ids: Set of rule IDs to ignore, as bytes
         ignore_pmfromfile: Whether to ignore rules containing @pmFromFile
 
     Returns:
-        Tuple of (processed_content, list_of_(removed_rule_id, reason))
+        Tuple of (indented_content, list_of_(removed_rule_id, reason))
     """
     try:
-        content = file_path.read_text(encoding='utf-8', errors='ignore')
+        # Files are always read whole, so no buffer layer is needed on top of the
+        # raw file: they are read with a single sized read() call
+        with open(file_path, 'rb', buffering=0) as f:
+            content = f.read()
     except Exception as e:
         print(f"ERROR: Failed to read {file_path}: {e}", file=sys.stderr)
-        return "", []
+        return b"", []
 
     # Check if file has any SecRule or SecAction
-    if "SecRule" not in content and "SecAction" not in content:
-        return "", []
+    if b"SecRule" not in content and b"SecAction" not in content:
+        return b"", []
+
+    # The content is filtered as bytes
+    if not content.isascii():
+        # Drop invalid UTF-8 sequences so that the output is valid UTF-8, and empty
+        # the lines holding only Unicode whitespace, which the byte-level checks
+        # below do not recognize. Pure ASCII content (the common case) skips this.
+        text = str(content, 'utf-8', 'ignore')
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        content = UNICODE_BLANK_LINE_RE.sub(' ', text).encode()
+    elif b'\r' in content:
+        # Normalize line breaks like a text mode read would
+        content = content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
 
-    blocks = split_into_rules(content)
-    filtered_blocks = []
     removed_rules = []
+    indented_content = b'\n'.join(filter_and_indent(content, ignore_rule_ids, ignore_pmfromfile, removed_rules))
+    return indented_content, removed_rules
+
+
+def filter_and_indent(content: bytes, ignore_rule_ids: FrozenSet[bytes], ignore_pmfromfile: bool, removed_rules: List[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    Filter the Sec* directives of a rule file and yield the remaining content indented for YAML.
+
+    Sec* directives are located with a single regex scan over the whole file and each
+    kept directive is indented in one go, only the lines between directives (comments,
+    blank lines, etc.) are handled one by one. Blank lines are yielded empty.
+
+    Args:
+        content: Raw content of the rule file with normalized line breaks
+        ignore_rule_ids: Set of rule IDs to ignore, as bytes
+        ignore_pmfromfile: Whether to ignore rules containing @pmFromFile
+        removed_rules: List that (removed_rule_id, reason) tuples are appended to
 
-    for block in blocks:
-        stripped_block = block.strip()
-        # Check if this block is a Sec* directive (SecRule, SecAction, etc.)
-        if stripped_block and not stripped_block.startswith('#') and stripped_block.startswith('Sec'):
+    Yields:
+        Indented lines, or whole indented directives, without their final line break
+    """
+    position = 0
+    # Runs of empty lines are only yielded once something follows them, as a single
+    # piece of line breaks, and a final empty line is dropped like splitlines() would
+    pending_empty = 0
+
+    # Most files have no continuation at all, skip the multi-line matching for them
+    rule_re = RULE_RE if CONTINUATION_RE.search(content) else SINGLE_LINE_RULE_RE
+    # Without any filter requested every directive is kept, as is
+    filtering = bool(ignore_rule_ids) or ignore_pmfromfile
+
+    for match in rule_re.finditer(content):
+        for line in content[position:match.start()].split(b'\n')[:-1]:
+            if not line:
+                pending_empty += 1
+                continue
+            if pending_empty:
+                yield b"\n" * (pending_empty - 1)
+                pending_empty = 0
+            yield b"    " + line if line.strip() else b""
+        # Skip the line break that ends the directive
+        position = match.end() + 1
+
+        block = match.group(0)
+        if filtering:
+            # Extract the ID of the directive (id:NUMBER)
+            id_match = ID_RE.search(block)
+            rule_id = id_match.group(1) if id_match else b"unknown"
             # Check for @pmFromFile (only relevant for SecRule) if ignore flag is set
-            if ignore_pmfromfile and stripped_block.startswith('SecRule') and '@pmFromFile' in block:
-                rule_id = extract_rule_id(block)
-                removed_rules.append((rule_id, "@pmFromFile not supported"))
+            if ignore_pmfromfile and match.group(1) == b'SecRule' and block.find(PMFROMFILE) != -1:
+                removed_rules.append((rule_id.decode(), "@pmFromFile not supported"))
+                continue
+            # Check if this Sec* directive has an ID in the ignore list
+            if rule_id in ignore_rule_ids:
+                removed_rules.append((rule_id.decode(), "Rule ID in ignore list"))
+                continue
+
+        if pending_empty:
+            yield b"\n" * (pending_empty - 1)
+            pending_empty = 0
+        # Only the last line of a directive can be blank, every other line ends
+        # with a backslash continuation
+        head, _, last = block.rpartition(b'\n')
+        if head and not last.strip():
+            yield b"    " + head.replace(b'\n', b'\n    ')
+            if last:
+                yield b""
             else:
-                # Check if this Sec* directive has an ID in the ignore list
-                rule_id = extract_rule_id(block)
-                if rule_id in ignore_rule_ids:
-                    removed_rules.append((rule_id, "Rule ID in ignore list"))
-                else:
-                    filtered_blocks.append(block)
+                pending_empty = 1
         else:
-            # Comments, blank lines, etc.
-            filtered_blocks.append(block)
+            yield b"    " + block.replace(b'\n', b'\n    ')
+
+    if position <= len(content):
+        for line in content[position:].split(b'\n'):
+            if not line:
+                pending_empty += 1
+                continue
+            if pending_empty:
+                yield b"\n" * (pending_empty - 1)
+                pending_empty = 0
+            yield b"    " + line if line.strip() else b""
 
-    processed_content = '\n'.join(filtered_blocks)
-    return processed_content, removed_rules
+    if pending_empty > 1:
+        yield b"\n" * (pending_empty - 2)
 
 
-def generate_configmap_name(file_path: Path) -> str:
+def generate_configmap_name(file_path: str) -> str:
     """
     Generate ConfigMap name from filename following Kubernetes DNS subdomain naming rules.
 
@@ -268,24 +327,18 @@ def generate_configmap_name(file_path: Path) -> str:
     - End with an alphanumeric character
     - Be at most 253 characters long
     """
-    # Remove .conf extension and convert to lowercase
-    name = file_path.stem.lower()
-
-    # Replace underscores with hyphens (underscores are not allowed)
-    name = name.replace('_', '-')
-
-    # Remove any characters that are not lowercase alphanumeric, hyphen, or period
-    name = re.sub(r'[^a-z0-9.-]', '', name)
-
-    # Ensure it starts with an alphanumeric character
-    name = re.sub(r'^[^a-z0-9]+', '', name)
+    # Remove .conf extension, convert to lowercase, replace underscores with hyphens
+    # (underscores are not allowed) and remove any other character that is not
+    # lowercase alphanumeric, hyphen, or period, all in a single pass
+    file_name = os.path.basename(file_path)
+    name = os.path.splitext(file_name)[0].translate(CONFIGMAP_NAME_TABLE)
 
-    # Ensure it ends with an alphanumeric character
-    name = re.sub(r'[^a-z0-9]+$', '', name)
+    # Ensure it starts and ends with an alphanumeric character
+    name = name.strip('-.')
 
     # Validate the resulting name
     if not name:
-        raise ValueError(f"Cannot generate valid ConfigMap name from file: {file_path.name}")
+        raise ValueError(f"Cannot generate valid ConfigMap name from file: {file_name}")
 
     if len(name) > 253:
         raise ValueError(f"Generated ConfigMap name exceeds 253 characters: {name}")
@@ -293,45 +346,38 @@ def generate_configmap_name(file_path: Path) -> str:
     return name
 
 
-def generate_configmap(file_path: Path, ignore_rule_ids: Set[str], ignore_pmfromfile: bool) -> Tuple[str, str, str]:
+def generate_configmap(file_path: str, configmap_name: str, ignore_rule_ids: FrozenSet[bytes], ignore_pmfromfile: bool) -> Tuple[bytes, str, List[Tuple[str, str]]]:
     """
     Generate a ConfigMap YAML for a rule file.
 
+    Removed rules are returned for the caller to report. The YAML is returned
+    encoded, ready to be written out.
+
     Args:
         file_path: Path to the rule file
-        ignore_rule_ids: Set of rule IDs to ignore
+        configmap_name: Name of the ConfigMap, see generate_configmap_name
+        ignore_rule_ids: Set of rule IDs to ignore, as bytes
         ignore_pmfromfile: Whether to ignore rules containing @pmFromFile
 
     Returns:
-        Tuple of (configmap_name, configmap_yaml, skip_reason)
+        Tuple of (configmap_yaml, skip_reason, list_of_(removed_rule_id, reason))
         skip_reason will be empty string if not skipped
     """
-    configmap_name = generate_configmap_name(file_path)
-
     processed_content, removed_rules = process_file_content(file_path, ignore_rule_ids, ignore_pmfromfile)
 
-    # Log removed rules
-    if removed_rules:
-        print(f"  ⚠ WARNING: Ignored rules in {file_path.name}:", file=sys.stderr)
-        for rule_id, reason in removed_rules:
-            print(f"    - Rule ID: {rule_id} ({reason})", file=sys.stderr)
-
     if not processed_content.strip():
-        return "", "", "No SecRule or SecAction directives found"
+        return b"", "No SecRule or SecAction directives found", removed_rules
 
-    # Indent the rules content for YAML
-    indented_rules = "\n".join(f"    {line}" if line.strip() else "" for line in processed_content.splitlines())
-
-    configmap = f"""apiVersion: v1
+    configmap = b"""apiVersion: v1
 kind: ConfigMap
 metadata:
-  name: {configmap_name}
+  name: %s
 data:
   rules: |
-{indented_rules}
-"""
+%s
+""" % (configmap_name.encode(), processed_content)
 
-    return configmap_name, configmap, ""
+    return configmap, "", removed_rules
 
 
 def generate_ruleset(configmap_names: List[str], include_base_rules: bool = True) -> str:
@@ -413,20 +459,47 @@ Examples:
     # Get all rule files
     rule_files = get_rule_files(args.rules_dir)
 
+    # Names only depend on the file names, compute them upfront so that invalid
+    # names are reported before anything is written
+    configmap_names_by_file = [generate_configmap_name(rule_file) for rule_file in rule_files]
+
     # Process each file
     processed_count = 0
     skipped_count = 0
-    configmaps = []
     configmap_names = []
 
     print(f"\nProcessing {len(rule_files)} files...\n", file=sys.stderr)
 
-    for rule_file in rule_files:
-        print(f"Processing: {rule_file.name}", file=sys.stderr)
-        configmap_name, configmap_yaml, skip_reason = generate_configmap(rule_file, ignore_rule_ids, args.ignore_pmFromFile)
+    # ConfigMaps are streamed to stdout as they are produced through one large
+    # buffer, only their names are kept for the RuleSet
+    output = open(sys.stdout.fileno(), 'wb', buffering=1 << 20, closefd=False)
+
+    # Base-rules ConfigMap first
+    base_rules = BASE_RULES_CONFIGMAP.rstrip()
+    if args.include_test_rule:
+        base_rules += "\n" + X_CRS_TEST_RULE
+    output.write(base_rules.encode() + b"\n")
+
+    # Rule IDs are matched as bytes in the rule files
+    ignore_rule_ids_bytes = frozenset(rule_id.encode() for rule_id in ignore_rule_ids)
+
+    for rule_file, configmap_name in zip(rule_files, configmap_names_by_file):
+        rule_file_name = os.path.basename(rule_file)
+        print(f"Processing: {rule_file_name}", file=sys.stderr)
+
+        configmap_yaml, skip_reason, removed_rules = generate_configmap(
+            rule_file, configmap_name, ignore_rule_ids_bytes, args.ignore_pmFromFile
+        )
+
+        # Log removed rules
+        if removed_rules:
+            print(f"  ⚠ WARNING: Ignored rules in {rule_file_name}:", file=sys.stderr)
+            for rule_id, reason in removed_rules:
+                print(f"    - Rule ID: {rule_id} ({reason})", file=sys.stderr)
 
         if configmap_yaml:
-            configmaps.append(configmap_yaml)
+            output.write(b"---\n")
+            output.write(configmap_yaml)
             configmap_names.append(configmap_name)
             processed_count += 1
             print(f"  ✓ Generated ConfigMap: {configmap_name}", file=sys.stderr)
@@ -436,6 +509,8 @@ Examples:
 
     # Generate RuleSet
     ruleset = generate_ruleset(configmap_names)
+    output.write(b"---\n" + ruleset.encode())
+    output.close()
 
     # Output summary
     print(f"\n{'='*60}", file=sys.stderr)
@@ -446,21 +521,5 @@ Examples:
     print(f"  Total ConfigMaps: {len(configmap_names) + 1}", file=sys.stderr)
     print(f"{'='*60}\n", file=sys.stderr)
 
-    # Print base-rules ConfigMap first
-    base_rules_output = BASE_RULES_CONFIGMAP.rstrip()
-    if args.include_test_rule:
-        base_rules_output += "\n" + X_CRS_TEST_RULE
-    print(base_rules_output)
-
-    # Print generated ConfigMaps
-    for configmap in configmaps:
-        print("---")
-        print(configmap, end="")
-
-    # Print RuleSet
-    print("---")
-    print(ruleset, end="")
-
-
 if __name__ == "__main__":
     main()
@@ -4,12 +4,19 @@
 #
 # NOTE: generally you should run this from the Makefile ("make cluster.kind")
 
+import asyncio
 import subprocess
 import argparse
 import os
 import sys
 import ipaddress
 import json
+import re
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import List, Optional
 
 default_namespace: str = "integration-tests"
 gateway_api: str = (
@@ -17,8 +24,64 @@ gateway_api: str = (
     "releases/download/v1.4.1/standard-install.yaml"
 )
 sail_repo: str = "https://istio-ecosystem.github.io/sail-operator"
+helm_repo_max_age: int = 3600
 
+metallb_manifests_template: str = """
+apiVersion: metallb.io/v1beta1
+kind: IPAddressPool
+metadata:
+  namespace: metallb-system
+  name: kube-services
+spec:
+  addresses:
+  - {iprange}
+---
+apiVersion: metallb.io/v1beta1
+kind: L2Advertisement
+metadata:
+  name: kube-services
+  namespace: metallb-system
+spec:
+  ipAddressPools:
+  - kube-services
+"""
+
+gateway_class_manifest: str = """
+apiVersion: gateway.networking.k8s.io/v1
+kind: GatewayClass
+metadata:
+  name: istio
+spec:
+  controllerName: istio.io/gateway-controller
+"""
+
+istio_manifest_template: str = """
+apiVersion: sailoperator.io/v1
+kind: Istio
+metadata:
+  namespace: coraza-system
+  name: coraza
+spec:
+  namespace: coraza-system
+  version: v{istio_version}
+  values:
+    pilot:
+      env:
+        PILOT_GATEWAY_API_CONTROLLER_NAME: "istio.io/gateway-controller"
+        PILOT_ENABLE_GATEWAY_API: "true"
+        PILOT_ENABLE_GATEWAY_API_STATUS: "true"
+        PILOT_ENABLE_ALPHA_GATEWAY_API: "false"
+        PILOT_ENABLE_GATEWAY_API_DEPLOYMENT_CONTROLLER: "true"
+        PILOT_ENABLE_GATEWAY_API_GATEWAYCLASS_CONTROLLER: "false"
+        PILOT_GATEWAY_API_DEFAULT_GATEWAYCLASS_NAME: "istio"
+        PILOT_MULTI_NETWORK_DISCOVER_GATEWAY_API: "false"
+        ENABLE_GATEWAY_API_MANUAL_DEPLOYMENT: "false"
+        PILOT_ENABLE_GATEWAY_API_CA_CERT_ONLY: "true"
+        PILOT_ENABLE_GATEWAY_API_COPY_LABELS_ANNOTATIONS: "false"
+"""
 
+
+@cache
 def get_istio_version() -> str:
     """Get ISTIO_VERSION from environment, required for cluster setup operations."""
     istio_version = os.environ.get("ISTIO_VERSION")
@@ -32,7 +95,8 @@ def get_istio_version() -> str:
 
 def get_kind_network_range() -> str:
     """Get the Network range used by kind network, to be used during LoadBalancer deployment"""
-    result = run("docker network inspect kind", check=False, capture_output=True)
+    # Let docker extract the IPAM configuration instead of parsing the whole network
+    result = run(["docker", "network", "inspect", "kind", "-f", "{{json .IPAM.Config}}"], check=False, capture_output=True)
     if result.returncode != 0:
         print("ERROR: Could not get the kind network range", file=sys.stderr)
         sys.exit(1)
@@ -44,10 +108,9 @@ def get_kind_network_range() -> str:
         if metallb_pool_size_int > 255 or metallb_pool_size_int < 1:
             print(f"WARNING: Unusual METALLB_POOL_SIZE: {metallb_pool_size_int}", file=sys.stderr)
         # result.stdout is str because capture_output=True uses text=True
-        kind_network = json.loads(result.stdout)
-        ipam_config = kind_network[0].get("IPAM", {}).get("Config", [])
+        ipam_config = json.loads(result.stdout)
         if not ipam_config:
-            raise ValueError(f"No IPAM configuration found for network: {kind_network}")
+            raise ValueError("No IPAM configuration found for network: kind")
         ipv4_config = next((c for c in ipam_config if ":" not in c.get("Subnet", "")), None)
         if not ipv4_config:
             raise ValueError("No IPv4 configuration found.")
@@ -62,13 +125,42 @@ def get_kind_network_range() -> str:
         sys.exit(1)
 
 
-def run(cmd: str, check: bool = True, capture_output: bool = False) -> subprocess.CompletedProcess:
+def run(cmd: List[str], check: bool = True, capture_output: bool = False, input_str: Optional[str] = None) -> subprocess.CompletedProcess:
     return subprocess.run(
         cmd,
-        shell=True,
         check=check,
         capture_output=capture_output,
-        text=capture_output  # Use text mode when capturing output for easier handling
+        input=input_str,
+        text=capture_output or input_str is not None  # Use text mode when capturing output for easier handling
+    )
+
+
+def kubectl_wait(context: str, namespace: str, condition: str, resource: str) -> List[str]:
+    return [
+        "kubectl", "--context", context, "--namespace", namespace, "wait",
+        f"--for=condition={condition}", resource, "--timeout=300s"
+    ]
+
+
+def wait_all(waits: List[List[str]]) -> None:
+    """Run kubectl wait commands concurrently, fail if any of them fails."""
+    async def wait_concurrently() -> List[int]:
+        processes = [await asyncio.create_subprocess_exec(*cmd) for cmd in waits]
+        return await asyncio.gather(*(process.wait() for process in processes))
+
+    returncodes = asyncio.run(wait_concurrently())
+    failed = [(cmd, returncode) for cmd, returncode in zip(waits, returncodes) if returncode != 0]
+    for cmd, returncode in failed:
+        print(f"ERROR: {' '.join(cmd)} failed with exit code {returncode}", file=sys.stderr)
+    if failed:
+        raise subprocess.CalledProcessError(failed[0][1], failed[0][0])
+
+
+def apply_manifests(context: str, *manifests: str) -> None:
+    """Apply YAML manifests with a single kubectl call, passing them on stdin."""
+    run(
+        ["kubectl", "--context", context, "apply", "-f", "-"],
+        input_str="---\n".join(manifests)
     )
 
 
@@ -78,26 +170,42 @@ def get_kind_context(name: str) -> str:
 
 def build_images() -> None:
     print("Building container images")
-    run("make build.image")
+    run(["make", "build.image"])
 
 
 def create_cluster(name: str) -> None:
     print(f"Creating kind cluster: {name}")
-    result = run(f"kind get clusters | grep -q '^{name}$'", check=False)
-    if result.returncode == 0:
+    result = run(["kind", "get", "clusters"], check=False, capture_output=True)
+    if name in result.stdout.splitlines():
         print(f"Cluster {name} already exists, skipping creation")
     else:
-        run(f"kind create cluster --name {name}")
+        run(["kind", "create", "cluster", "--name", name])
 
 
 def load_images(name: str) -> None:
     print(f"Loading images into kind cluster: {name}")
-    run("make cluster.load-images")
+    run(["make", "cluster.load-images"])
+
+
+def cached_download(name: str, url: str) -> str:
+    """Download a release asset once and return the path to the local copy."""
+    cache_dir = os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "coraza-kubernetes-operator"
+    )
+    # Release URLs end in <version>/<asset>, which keys the cache by version
+    path = os.path.join(cache_dir, "-".join([name, *url.rsplit("/", 2)[1:]]))
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        urllib.request.urlretrieve(url, tmp_path)
+        os.replace(tmp_path, path)
+    return path
 
 
 def deploy_gateway_api_crds(context: str) -> None:
     print("Deploying Gateway API CRDs")
-    run(f"kubectl --context {context} apply -f {gateway_api}")
+    run(["kubectl", "--context", context, "apply", "-f", cached_download("gateway-api", gateway_api)])
 
 def deploy_metallb(context: str) -> bool:
     metallb_version = os.environ.get("METALLB_VERSION")
@@ -107,19 +215,25 @@ def deploy_metallb(context: str) -> bool:
     print("Deploying MetalLB")
     try:
         run(
-            f"kubectl --context {context} apply --server-side "
-            f"-f https://raw.githubusercontent.com/metallb/metallb/v{metallb_version}/config/manifests/metallb-native.yaml",
+            [
+                "kubectl", "--context", context, "apply", "--server-side",
+                "-f", f"https://raw.githubusercontent.com/metallb/metallb/v{metallb_version}/config/manifests/metallb-native.yaml"
+            ],
             capture_output=True
         )
         run(
-            f"kubectl --context {context} wait --for=condition=Available "
-            f"deployment/controller -n metallb-system --timeout=300s",
+            [
+                "kubectl", "--context", context, "wait", "--for=condition=Available",
+                "deployment/controller", "-n", "metallb-system", "--timeout=300s"
+            ],
             capture_output=True
         )
         # Wait for webhook to be ready to avoid race condition with CRD creation
         run(
-            f"kubectl --context {context} wait --for=condition=Ready "
-            f"pod -l component=webhook-server -n metallb-system --timeout=300s",
+            [
+                "kubectl", "--context", context, "wait", "--for=condition=Ready",
+                "pod", "-l", "component=webhook-server", "-n", "metallb-system", "--timeout=300s"
+            ],
             check=False,  # Webhook might not exist in all versions
             capture_output=True
         )
@@ -133,171 +247,137 @@ def deploy_metallb(context: str) -> bool:
             print("kubectl stderr:", e.stderr, file=sys.stderr)
         sys.exit(1)
 
+def setup_metallb(context: str) -> bool:
+    """Deploy MetalLB with an address pool from the kind network, returns whether it is enabled."""
+    if not deploy_metallb(context):
+        return False
+    create_metallb_manifests(context, get_kind_network_range())
+    return True
+
 def create_metallb_manifests(context: str, iprange: str) -> None:
     print("Creating MetalLB pool and L2Advertisement")
-    metallb_manifests = f"""
-apiVersion: metallb.io/v1beta1
-kind: IPAddressPool
-metadata:
-  namespace: metallb-system
-  name: kube-services
-spec:
-  addresses:
-  - {iprange}
----
-apiVersion: metallb.io/v1beta1
-kind: L2Advertisement
-metadata:
-  name: kube-services
-  namespace: metallb-system
-spec:
-  ipAddressPools:
-  - kube-services
-"""
+    metallb_manifests = metallb_manifests_template.format(iprange=iprange)
     run(
-        f"echo '{metallb_manifests}' | kubectl "
-        f"--context {context} apply --server-side -f -"
+        ["kubectl", "--context", context, "apply", "--server-side", "-f", "-"],
+        input_str=metallb_manifests
     )
 
-def deploy_istio_sail(context: str) -> None:
+def helm_repo_has_version(name: str, url: str, version: str) -> bool:
+    """Check whether a Helm repository is configured, was fetched recently and lists a chart version."""
+    # Let helm resolve its own paths (HELM_CONFIG_HOME, HELM_CACHE_HOME, platform defaults)
+    result = run(["helm", "env"], check=False, capture_output=True)
+    if result.returncode != 0:
+        return False
+    helm_env = dict(line.split("=", 1) for line in result.stdout.splitlines() if "=" in line)
+    repository_config = helm_env.get("HELM_REPOSITORY_CONFIG", "").strip('"')
+    index_file = os.path.join(helm_env.get("HELM_REPOSITORY_CACHE", "").strip('"'), f"{name}-index.yaml")
+    try:
+        if time.time() - os.path.getmtime(index_file) >= helm_repo_max_age:
+            return False
+        with open(repository_config, encoding="utf-8") as f:
+            repositories = f.read()
+        with open(index_file, encoding="utf-8") as f:
+            index = f.read()
+    except OSError:
+        return False
+    if f"name: {name}\n" not in repositories or f"url: {url}\n" not in repositories:
+        return False
+    # A newer chart version is only listed once the index has been updated
+    return re.search(rf'^\s+version: "?{re.escape(version)}"?$', index, re.MULTILINE) is not None
+
+
+def deploy_istio_sail(context: str) -> List[str]:
     istio_version = get_istio_version()
 
     print("Deploying Istio Sail Operator")
-    run(f"helm repo add sail-operator {sail_repo}")
-    run("helm repo update")
-    run(f"kubectl --context {context} create namespace sail-operator", check=False)
+    if helm_repo_has_version("sail-operator", sail_repo, istio_version):
+        print(f"Helm repository sail-operator is up to date and has version {istio_version}, skipping update")
+    else:
+        run(["helm", "repo", "add", "sail-operator", sail_repo])
+        run(["helm", "repo", "update", "sail-operator"])
+    run(["kubectl", "--context", context, "create", "namespace", "sail-operator"], check=False)
 
     result = run(
-        f"helm list --namespace sail-operator --kube-context {context} "
-        f"-o json | grep -q sail-operator",
-        check=False
+        ["helm", "list", "--namespace", "sail-operator", "--kube-context", context, "-o", "json"],
+        check=False,
+        capture_output=True
     )
 
-    if result.returncode != 0:
-        run(
-            f"helm install sail-operator sail-operator/sail-operator "
-            f"--version {istio_version} "
-            f"--namespace sail-operator --kube-context {context}"
-        )
+    if "sail-operator" not in result.stdout:
+        run([
+            "helm", "install", "sail-operator", "sail-operator/sail-operator",
+            "--version", istio_version,
+            "--namespace", "sail-operator", "--kube-context", context
+        ])
     else:
         print("Sail operator already installed, skipping")
 
-    run(
-        f"kubectl --context {context} wait --for=condition=Available "
-        f"deployment/sail-operator -n sail-operator --timeout=300s"
-    )
-
-
-def create_gateway_class(context: str) -> None:
-    print("Creating GatewayClass for Istio")
-    gateway_class = """
-apiVersion: gateway.networking.k8s.io/v1
-kind: GatewayClass
-metadata:
-  name: istio
-spec:
-  controllerName: istio.io/gateway-controller
-"""
-    run(
-        f"echo '{gateway_class}' | kubectl "
-        f"--context {context} apply -f -"
-    )
+    return kubectl_wait(context, "sail-operator", "Available", "deployment/sail-operator")
 
 
-def create_gateway(context: str, loadbalancer: bool) -> None:
-    run(
-        f"kubectl --context {context} "
-        f" create namespace {default_namespace}", check=False
-    )
+def create_gateway(context: str, loadbalancer: bool) -> List[str]:
+    run(["kubectl", "--context", context, "create", "namespace", default_namespace], check=False)
 
     print("Creating Gateway for Istio")
     if loadbalancer:
-        run(f"kubectl --context {context} -n {default_namespace} apply -f config/samples/gateway.yaml")
+        run(["kubectl", "--context", context, "-n", default_namespace, "apply", "-f", "config/samples/gateway.yaml"])
     else:
-        run(f"kubectl annotate -f config/samples/gateway.yaml networking.istio.io/service-type=ClusterIP --local -o yaml |kubectl --context {context} -n {default_namespace} apply -f -")
+        gateway = run(
+            [
+                "kubectl", "annotate", "-f", "config/samples/gateway.yaml",
+                "networking.istio.io/service-type=ClusterIP", "--local", "-o", "yaml"
+            ],
+            capture_output=True
+        )
+        run(["kubectl", "--context", context, "-n", default_namespace, "apply", "-f", "-"], input_str=gateway.stdout)
 
-    run(
-        f"kubectl --context {context} -n {default_namespace} wait "
-        "--for=condition=Programmed gateway/coraza-gateway --timeout=300s"
-    )
+    return kubectl_wait(context, default_namespace, "Programmed", "gateway/coraza-gateway")
 
 
-def create_istio_control_plane(context: str) -> None:
+def create_istio_control_plane(context: str) -> List[str]:
     istio_version = get_istio_version()
 
-    run(
-        f"kubectl --context {context} "
-        " create namespace coraza-system", check=False
-    )
+    run(["kubectl", "--context", context, "create", "namespace", "coraza-system"], check=False)
 
-    print("Creating Istio control-plane")
-    istio = f"""
-apiVersion: sailoperator.io/v1
-kind: Istio
-metadata:
-  namespace: coraza-system
-  name: coraza
-spec:
-  namespace: coraza-system
-  version: v{istio_version}
-  values:
-    pilot:
-      env:
-        PILOT_GATEWAY_API_CONTROLLER_NAME: "istio.io/gateway-controller"
-        PILOT_ENABLE_GATEWAY_API: "true"
-        PILOT_ENABLE_GATEWAY_API_STATUS: "true"
-        PILOT_ENABLE_ALPHA_GATEWAY_API: "false"
-        PILOT_ENABLE_GATEWAY_API_DEPLOYMENT_CONTROLLER: "true"
-        PILOT_ENABLE_GATEWAY_API_GATEWAYCLASS_CONTROLLER: "false"
-        PILOT_GATEWAY_API_DEFAULT_GATEWAYCLASS_NAME: "istio"
-        PILOT_MULTI_NETWORK_DISCOVER_GATEWAY_API: "false"
-        ENABLE_GATEWAY_API_MANUAL_DEPLOYMENT: "false"
-        PILOT_ENABLE_GATEWAY_API_CA_CERT_ONLY: "true"
-        PILOT_ENABLE_GATEWAY_API_COPY_LABELS_ANNOTATIONS: "false"
-"""
-    run(
-        f"echo '{istio}' | kubectl "
-        f"--context {context} apply -f -"
-    )
-    run(
-        f"kubectl --context {context} --namespace coraza-system wait "
-        "--for=condition=Ready istio/coraza --timeout=300s"
-    )
+    print("Creating Istio control-plane and GatewayClass for Istio")
+    # Both resources only depend on CRDs installed earlier, apply them together
+    apply_manifests(context, istio_manifest_template.format(istio_version=istio_version), gateway_class_manifest)
+    return kubectl_wait(context, "coraza-system", "Ready", "istio/coraza")
 
 
-def deploy_coraza_operator(context: str) -> None:
+def deploy_coraza_operator(context: str) -> List[str]:
     print("Deploying Coraza Operator")
 
     result = run(
-        f"kubectl --context {context} --namespace coraza-system "
-        f"get deployment coraza-controller-manager 2>/dev/null",
-        check=False
+        ["kubectl", "--context", context, "--namespace", "coraza-system", "get", "deployment", "coraza-controller-manager"],
+        check=False,
+        capture_output=True
     )
     deployment_exists = result.returncode == 0
 
-    run(f"kubectl --context {context} apply -k config/default")
+    run(["kubectl", "--context", context, "apply", "-k", "config/default"])
 
     if deployment_exists:
         print("Restarting existing controller-manager deployment to pick up any image updates")
-        run(
-            f"kubectl --context {context} --namespace coraza-system "
-            f"rollout restart deployment/coraza-controller-manager"
-        )
+        run([
+            "kubectl", "--context", context, "--namespace", "coraza-system",
+            "rollout", "restart", "deployment/coraza-controller-manager"
+        ])
 
-    run(
-        f"kubectl --context {context} --namespace coraza-system wait "
-        "--for=condition=Available "
-        "deployment/coraza-controller-manager --timeout=300s"
-    )
+    return kubectl_wait(context, "coraza-system", "Available", "deployment/coraza-controller-manager")
 
+
+@cache
 def detect_docker() -> bool:
     """Detect if Docker is available (as opposed to Podman)."""
     print("detecting if Docker is available, otherwise assuming this is a Podman cluster")
-    result = run("docker version -f json", check=False, capture_output=True)
+    # The full JSON is parsed, docker leaves Client.Platform unset in some builds
+    # (e.g. distribution packages) and a template on its fields then fails
+    result = run(["docker", "version", "-f", "json"], check=False, capture_output=True)
     if result.returncode != 0:
         # Docker not available, check for podman
         print("Docker not found, checking for podman")
-        podman_result = run("podman version", check=False, capture_output=True)
+        podman_result = run(["podman", "version"], check=False, capture_output=True)
         if podman_result.returncode != 0:
             print("ERROR: Neither docker nor podman is available", file=sys.stderr)
             print("Please install either docker or podman to continue", file=sys.stderr)
@@ -317,29 +397,41 @@ def detect_docker() -> bool:
 
 def delete_cluster(name: str) -> None:
     print(f"Deleting kind cluster: {name}")
-    run(f"kind delete cluster --name {name}", check=False)
+    run(["kind", "delete", "cluster", "--name", name], check=False)
 
 
 def setup_cluster(name: str) -> None:
     docker_available = detect_docker()
-    build_images()
-    create_cluster(name)
+
+    # Building the images does not need the cluster, only loading them does
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        images = executor.submit(build_images)
+        create_cluster(name)
+        images.result()
     load_images(name)
 
     context = get_kind_context(name)
 
-    deploy_gateway_api_crds(context)
-    metallb_enabled = False
-    if docker_available:
-        if deploy_metallb(context):
-            metallb_ip_range = get_kind_network_range()
-            create_metallb_manifests(context, metallb_ip_range)
-            metallb_enabled = True
-    deploy_istio_sail(context)
-    create_istio_control_plane(context)
-    create_gateway_class(context)
-    create_gateway(context, metallb_enabled)
-    deploy_coraza_operator(context)
+    # The Gateway API CRDs, MetalLB and the Sail operator do not depend on each
+    # other, deploy them in parallel
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        gateway_api_crds = executor.submit(deploy_gateway_api_crds, context)
+        metallb = executor.submit(setup_metallb, context) if docker_available else None
+        sail_operator = executor.submit(deploy_istio_sail, context)
+
+        gateway_api_crds.result()
+        metallb_enabled = metallb.result() if metallb else False
+        sail_operator_wait = sail_operator.result()
+
+    # The Istio control-plane and the Gateway are reconciled once their controllers
+    # are up, apply them right away and wait for them together
+    istio_wait = create_istio_control_plane(context)
+    gateway_wait = create_gateway(context, metallb_enabled)
+    wait_all([sail_operator_wait, istio_wait])
+
+    # The operator owns Istio WasmPlugins, so it is only deployed once Istio is
+    # ready and has installed its CRDs
+    wait_all([gateway_wait, deploy_coraza_operator(context)])
 
     print("Cluster setup complete")
 